@@ -1,39 +1,162 @@
-from txp_parser import SpriteSet_from_file
+from txp_parser import SpriteSet_from_file, ImagePool, BufferedStreamHandler
 import os,sys
+import io
+import argparse
+import numpy as np
+from PIL import Image
 import re
+import logging
+import logging.handlers
+import multiprocessing
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 
+log=logging.getLogger(__name__)
+
+
+_PV_RE=re.compile(r'(?:^|[._])(pv\d+)(?=[._]|$)',re.IGNORECASE)
+
 def findpv(file:str)->str:
-    file=file.replace(".","_")
-    for part in file.split("_"):
-        if part.startswith("pv"):
-            return part
-    return None
+    m=_PV_RE.search(file)
+    return m.group(1) if m else None
+
+# per worker process, so cover buffers are recycled across the archives it handles
+_pool=ImagePool()
+_PNG_BUF=io.BytesIO()
+
+def _to_palette(img:Image.Image)->Image.Image:
+    # exact palette (no dithering/merging) when the cover has at most 256 distinct RGBA colors
+    if img.getcolors(256) is None:
+        return img
+    rgba=np.ascontiguousarray(np.asarray(img.convert("RGBA")))
+    packed=rgba.view(np.uint32).reshape(rgba.shape[:2])
+    colors,index=np.unique(packed,return_inverse=True)
+    p=Image.fromarray(index.reshape(packed.shape).astype(np.uint8),"P")
+    p.putpalette(colors.view(np.uint8).tobytes(),"RGBA")
+    return p
+
+def _save_png(img,png:str,palette:bool=False,compress_level:int=1):
+    # encode into the reused buffer, then hand the bytes to disk in one write
+    _PNG_BUF.seek(0)
+    _PNG_BUF.truncate()
+    if palette:
+        img=_to_palette(img)
+    img.save(_PNG_BUF,format="PNG",optimize=False,compress_level=compress_level)
+    # write straight from the buffer's memory into a private temp file, then move it into
+    # place, so a reader never sees a half-written cover
+    tmp=f"{png}.{os.getpid()}.tmp"
+    fd=os.open(tmp,os.O_WRONLY|os.O_CREAT|os.O_TRUNC|getattr(os,"O_BINARY",0),0o644)
+    try:
+        with _PNG_BUF.getbuffer() as mv:
+            n=0
+            while n<len(mv):
+                n+=os.write(fd,mv[n:])
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp)
+        raise
+    os.close(fd)
+    os.replace(tmp,png)
+
+def _init_worker(log_queue):
+    # log records go back to the parent's listener; a worker must never write to the
+    # (possibly forked, unflushed) buffered stdout stream itself, it exits without flushing it
+    root=logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    # the pool already runs one process per core; numba's parallel kernels would otherwise
+    # start a thread per core in every worker (cpu_count^2 threads)
+    try:
+        import numba
+    except ImportError:
+        return
+    numba.set_num_threads(1)
+
+def _prefetch(path:str):
+    # pull the archive into the page cache so the worker's read hits memory
+    fd=os.open(path,os.O_RDONLY|getattr(os,"O_BINARY",0))
+    try:
+        if hasattr(os,"posix_fadvise"):
+            os.posix_fadvise(fd,0,0,os.POSIX_FADV_WILLNEED)
+        while os.read(fd,1<<20):
+            pass
+    finally:
+        os.close(fd)
+
+def _extract_cover(full:str,png:str,palette:bool=False,compress_level:int=1)->str:
+    ss=SpriteSet_from_file(full)
+    # look the cover up by name so only its own texture gets decoded
+    idx=ss.index_by_name("JK")
+    if idx is None:
+        return None
+    ss.image_pool=_pool
+    sprite_img=ss.decode_one(idx)
+    
+    _save_png(sprite_img,png,palette,compress_level)
+    _pool.release(sprite_img)
+    return png
 
 if __name__ == "__main__":
-    usedir=sys.argv[1]
-    print(usedir)
-    for file in os.listdir(usedir):
-        if not file.endswith(".farc"):
-            continue
-        print(file)
-        pv=findpv(file)
-        if pv==None:
-            print(f"cannot find pv name in {file}")
-            continue
-        
-        full=os.path.join(usedir,file)
-        sprite_img=None
-        for sprite,img in SpriteSet_from_file(full):
-            if "JK" in sprite.name:
-                sprite_img=img
-                break
-        if sprite_img==None:
-            print(f"cannot file cover in {full}")
-            continue
-        
-        
-        png=os.path.join("testfiles",pv+".png")
-        sprite_img.save(png)
-        print(f"saved png {png}")
-           
+    # 64 KiB buffered stdout: log lines reach the pipe in batches, not one write() each
+    stream=open(sys.stdout.fileno(),"w",buffering=1<<16,closefd=False)
+    handler=BufferedStreamHandler(stream)
+    logging.basicConfig(level=logging.INFO,format="%(message)s",handlers=[handler])
+    parser=argparse.ArgumentParser(description="export the JK cover sprite of every FARC in a directory")
+    parser.add_argument("usedir")
+    parser.add_argument("--palette",action="store_true",help="save covers with <=256 colors as 8-bit palette PNGs")
+    parser.add_argument("--final",action="store_true",help="use zlib level 9 for release exports (default favors speed)")
+    args=parser.parse_args()
+    usedir=args.usedir
+    compress_level=9 if args.final else 1
+    log.info(usedir)
+    base="testfiles"+os.sep
+    # created once here; workers write into it without re-checking
+    os.makedirs(base,exist_ok=True)
+    force=os.environ.get("FORCE")=="1"
+    # keyed by output path: archives of the same pv map to one cover, the last one scanned wins
+    tasks={}
+    with os.scandir(usedir) as it:
+        for entry in it:
+            name=entry.name
+            if len(name)<5 or name[-5:].lower()!=".farc":
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            log.info(name)
+            pv=findpv(name)
+            if pv is None:
+                log.info(f"cannot find pv name in {name}")
+                continue
+            png=f"{base}{pv}.png"
+            if not force and os.path.lexists(png):
+                log.info(f"skip {png}")
+                continue
+            tasks[png]=(entry.inode(),entry.path,png)
+    # inode order roughly follows on-disk layout, so cold reads seek less
+    tasks=sorted(tasks.values())
+    
+    # each archive is independent, so decode + PNG encode fan out across cores
+    workers=os.cpu_count() or 1
+    # worker log records come through this queue; the listener writes them with the parent's handler
+    log_queue=multiprocessing.Queue()
+    listener=logging.handlers.QueueListener(log_queue,handler)
+    listener.start()
+    with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(log_queue,)) as ex, ThreadPoolExecutor(1) as prefetcher:
+        futures={ex.submit(_extract_cover,full,png,args.palette,compress_level):full for _,full,png in tasks}
+        # workers read the first batch right away; keep the next batch warming behind it
+        ahead=iter(tasks[workers:])
+        for _,full,_ in itertools.islice(ahead,workers):
+            prefetcher.submit(_prefetch,full)
+        for fut in as_completed(futures):
+            nxt=next(ahead,None)
+            if nxt is not None:
+                prefetcher.submit(_prefetch,nxt[1])
+            png=fut.result()
+            if png is None:
+                log.info(f"cannot file cover in {futures[fut]}")
+            else:
+                log.info(f"saved png {png}")
+    listener.stop()
@@ -1,14 +1,36 @@
 #!/usr/bin/env python3
 import os
 import struct
+import sys
 import json
 import argparse
+import logging
+import multiprocessing
 import io
+import itertools
+import mmap
+import queue
+import tarfile
+import threading
+import time
+import zlib
 import numpy as np
 from PIL import Image
 from texture2ddecoder import decode_bc1, decode_bc3
 from collections.abc import Generator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from functools import cached_property
+try:
+    from numba import njit, prange
+except ImportError:  # optional: without numba, DXT decoding goes through texture2ddecoder
+    njit = None
+    prange = range
+try:
+    import orjson
+except ImportError:  # optional: without orjson, summaries are written by the stdlib json module
+    orjson = None
+
+log = logging.getLogger(__name__)
 
 TXP_TEXSET_SIG = 0x03505854  # 'TXP' type 3
 TXP_TEXTURE_SIG_V4 = 0x04505854
@@ -16,6 +38,22 @@ TXP_TEXTURE_SIG_V5 = 0x05505854
 TXP_SUBTEXTURE_SIG = 0x02505854
 TXP_SPRITESET_SIG = 0x00000000  # SpriteSet signature (all zeros)
 
+# Chunk size for streaming FARC entries (same as CPython's gzip module)
+READ_BUFFER_SIZE = 128 * 1024
+
+# Below this many entries extract_farc stays serial; thread startup would cost more than it saves
+PARALLEL_EXTRACT_MIN_ENTRIES = 4
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the stream's own buffer."""
+    def flush(self):
+        pass
+
+    def close(self):
+        self.stream.flush()
+        super().close()
+
 
 class FarcEntry:
     """Represents a single entry in a FARC archive."""
@@ -38,13 +76,7 @@ class FarcArchive:
     @staticmethod
     def _read_cstring(f) -> str:
         """Read null-terminated string from file."""
-        name_bytes = bytearray()
-        while True:
-            b = f.read(1)
-            if not b or b[0] == 0:
-                break
-            name_bytes.extend(b)
-        return name_bytes.decode('utf-8', errors='ignore')
+        return read_cstring(f, errors='ignore')
     
     @classmethod
     def from_file(cls, farc_path: str) -> 'FarcArchive':
@@ -64,7 +96,7 @@ class FarcArchive:
         header_size_value = struct.unpack('>I', f.read(4))[0]
         self.header_size = header_size_value + 0x08
         
-        print(f"FARC signature: {self.signature}, header size: {self.header_size}")
+        log.debug("FARC signature: %s, header size: %d", self.signature, self.header_size)
         
         # Parse format-specific entries
         if self.signature == 'FARC':
@@ -82,7 +114,7 @@ class FarcArchive:
         padding = struct.unpack('>I', f.read(4))[0]
         self.alignment = struct.unpack('>I', f.read(4))[0]
         
-        print(f"  Compressed: {is_compressed_archive}, Encrypted: {is_encrypted}, Alignment: {self.alignment}")
+        log.debug("  Compressed: %s, Encrypted: %s, Alignment: %d", is_compressed_archive, is_encrypted, self.alignment)
         
         if is_encrypted:
             raise NotImplementedError("Encrypted FARC files not yet supported")
@@ -111,12 +143,12 @@ class FarcArchive:
                 is_compressed=is_compressed_archive and compressed_size != uncompressed_size
             )
             self.entries.append(entry)
-            print(f"  Entry: {name} (offset={offset}, size={uncompressed_size})")
+            log.debug("  Entry: %s (offset=%d, size=%d)", name, offset, uncompressed_size)
     
     def _parse_farc_lowercase(self, f):
         """Parse FArC format (older format)."""
         self.alignment = struct.unpack('>I', f.read(4))[0]
-        print(f"  Alignment: {self.alignment}")
+        log.debug("  Alignment: %d", self.alignment)
         
         # Read entries
         while f.tell() < self.header_size:
@@ -138,12 +170,13 @@ class FarcArchive:
                 is_compressed=is_compressed
             )
             self.entries.append(entry)
-            print(f"  Entry: {name} (offset={offset}, compressed={compressed_size}, uncompressed={uncompressed_size}, is_compressed={is_compressed})")
+            log.debug("  Entry: %s (offset=%d, compressed=%d, uncompressed=%d, is_compressed=%s)",
+                      name, offset, compressed_size, uncompressed_size, is_compressed)
     
     def _parse_farc_minimal(self, f):
         """Parse FArc format (minimal format, no compression)."""
         self.alignment = struct.unpack('>I', f.read(4))[0]
-        print(f"  Alignment: {self.alignment}")
+        log.debug("  Alignment: %d", self.alignment)
         
         # Read entries
         while f.tell() < self.header_size:
@@ -159,21 +192,71 @@ class FarcArchive:
                 is_compressed=False
             )
             self.entries.append(entry)
-            print(f"  Entry: {name} (offset={offset}, size={size})")
+            log.debug("  Entry: %s (offset=%d, size=%d)", name, offset, size)
     
     def extract_entry_data(self, f, entry: FarcEntry) -> bytes:
         """Extract and decompress data for a single entry."""
-        f.seek(entry.offset)
-        data = f.read(entry.compressed_size)
+        buf = io.BytesIO()
+        self.write_entry_data(f, entry, buf)
+        return buf.getvalue()
+    
+    def write_entry_data(self, f, entry: FarcEntry, out) -> int:
+        """Stream a single entry into a seekable output file, decompressing on the fly.
         
+        Returns the number of bytes written.
+        """
+        start = out.tell()
         if entry.is_compressed:
-            import gzip
             try:
-                data = gzip.decompress(data)
-            except Exception as e:
-                print(f"  GZip decompression failed for {entry.name}: {e}")
-        
-        return data
+                return self._gunzip_range(f, entry.offset, entry.compressed_size, out)
+            except (zlib.error, EOFError) as e:
+                log.warning("  GZip decompression failed for %s: %s", entry.name, e)
+                # keep the raw entry, as if it had not been compressed
+                out.seek(start)
+                out.truncate()
+        return self._copy_range(f, entry.offset, entry.compressed_size, out)
+    
+    @staticmethod
+    def _copy_range(f, offset: int, size: int, out) -> int:
+        f.seek(offset)
+        written = 0
+        while written < size:
+            chunk = f.read(min(size - written, READ_BUFFER_SIZE))
+            if not chunk:
+                break
+            written += out.write(chunk)
+        return written
+    
+    @staticmethod
+    def _gunzip_range(f, offset: int, size: int, out) -> int:
+        f.seek(offset)
+        remaining = size
+        decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        written = 0
+        while remaining > 0:
+            chunk = f.read(min(remaining, READ_BUFFER_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            while chunk:
+                if decomp is None:
+                    # between members: like gzip.decompress, zero padding is skipped and an
+                    # all-zero tail (possibly spread over later chunks) ends the stream
+                    chunk = chunk.lstrip(b'\x00')
+                    if not chunk:
+                        break
+                    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                written += out.write(decomp.decompress(chunk))
+                if not decomp.eof:
+                    break
+                # another gzip member may follow (gzip.decompress accepts concatenated members)
+                chunk = decomp.unused_data
+                decomp = None
+        if decomp is not None:
+            written += out.write(decomp.flush())
+        if decomp is not None and not decomp.eof:
+            raise EOFError('Compressed data ended before the end-of-stream marker was reached')
+        return written
 
 
 # TextureFormat enum mapping from C# MikuMikuLibrary
@@ -197,21 +280,57 @@ TEXTURE_FORMAT_MAP = {
 }
 
 
-def read_cstring(f):
-    s = bytearray()
+def read_cstring(f, errors='replace', chunk=256):
+    pos = f.tell()
+    if isinstance(f, mmap.mmap):
+        # search the mapping in place and slice the string straight out of it
+        end = f.find(b"\x00", pos)
+        if end < 0:
+            end = len(f)
+            f.seek(end)
+        else:
+            f.seek(end + 1)
+        return f[pos:end].decode('utf-8', errors=errors)
+    # read ahead in chunks and let bytes.find locate the terminator,
+    # then seek back to just past it
+    parts = []
     while True:
-        c = f.read(1)
-        if not c or c == b"\x00":
+        buf = f.read(chunk)
+        if not buf:
             break
-        s += c
-    return s.decode('utf-8', errors='replace')
+        i = buf.find(b"\x00")
+        if i >= 0:
+            parts.append(buf[:i])
+            f.seek(pos + i + 1)
+            break
+        parts.append(buf)
+        pos += len(buf)
+    return b''.join(parts).decode('utf-8', errors=errors)
+
+
+# Precompiled scalar structs per byte order, so hot reads never reparse a format string
+_SCALAR_STRUCTS = {
+    endian: {fmt: struct.Struct(endian + fmt) for fmt in ('i', 'I', 'f')}
+    for endian in ('<', '>')
+}
+
+
+def _buffer_view(f):
+    """Zero-copy memoryview over an mmap source, else None.
+    BytesIO is left out on purpose: getbuffer() on a BytesIO(data) unshares it, copying data."""
+    if isinstance(f, mmap.mmap):
+        return memoryview(f)
+    return None
 
 
 class Reader:
-    def __init__(self, f):
+    def __init__(self, f, view=None):
         self.f = f
+        # set when f is backed by memory, so blobs can be sliced out instead of copied;
+        # pass view (e.g. memoryview of the bytes behind a BytesIO) when f cannot provide one
+        self.mv = view if view is not None else _buffer_view(f)
         # default assume little-endian; will switch if header indicates big
-        self.endian = '<'
+        self.set_endian(True)
         self.base_stack = [0]
 
     def tell(self):
@@ -235,30 +354,79 @@ class Reader:
 
     def set_endian(self, little=True):
         self.endian = '<' if little else '>'
-
-    def read_fmt(self, fmt):
-        size = struct.calcsize(fmt)
-        data = self.f.read(size)
-        if len(data) != size:
-            raise EOFError('Unexpected EOF')
-        return struct.unpack(self.endian + fmt, data) if fmt != 's' else data
+        structs = _SCALAR_STRUCTS[self.endian]
+        self._s_i = structs['i']
+        self._s_I = structs['I']
+        self._s_f = structs['f']
 
     def read_int32(self):
-        return self.read_fmt('i')[0]
+        data = self.f.read(4)
+        if len(data) != 4:
+            raise EOFError('Unexpected EOF')
+        return self._s_i.unpack(data)[0]
 
     def read_uint32(self):
-        return self.read_fmt('I')[0]
+        data = self.f.read(4)
+        if len(data) != 4:
+            raise EOFError('Unexpected EOF')
+        return self._s_I.unpack(data)[0]
 
     def read_float(self):
-        return self.read_fmt('f')[0]
+        data = self.f.read(4)
+        if len(data) != 4:
+            raise EOFError('Unexpected EOF')
+        return self._s_f.unpack(data)[0]
+
+    def read_fmt_at(self, off, struct_obj):
+        if self.mv is not None:
+            return struct_obj.unpack_from(self.mv, off)
+        cur = self.tell()
+        self.seek(off)
+        data = self.f.read(struct_obj.size)
+        self.seek(cur)
+        if len(data) != struct_obj.size:
+            raise EOFError('Unexpected EOF')
+        return struct_obj.unpack(data)
 
     def read_bytes(self, n):
         return self.f.read(n)
 
+    def read_view(self, n):
+        # like read_bytes, but a memoryview slice of the source when it lives in memory
+        if self.mv is None:
+            return self.f.read(n)
+        pos = self.tell()
+        end = len(self.mv) if n < 0 else min(pos + n, len(self.mv))
+        self.seek(end)
+        return self.mv[pos:end]
+
     def read_offset(self):
         # assume 32-bit offsets like in the C# code (AddressSpace.Int32)
         return self.read_uint32()
 
+    def read_offsets(self, count):
+        # whole offset table in one read + unpack instead of count separate calls
+        if count <= 0:
+            return ()
+        data = self.read_view(4 * count)
+        if len(data) != 4 * count:
+            raise EOFError('Unexpected EOF')
+        return struct.unpack(f'{self.endian}{count}I', data)
+
+    def unpack(self, st: struct.Struct):
+        """Unpack one fixed-layout record at the current position and advance past it."""
+        if self.mv is not None:
+            # straight out of the in-memory buffer, no intermediate bytes object
+            pos = self.tell()
+            if pos + st.size > len(self.mv):
+                raise EOFError('Unexpected EOF')
+            self.seek(pos + st.size)
+            return st.unpack_from(self.mv, pos)
+        data = self.f.read(st.size)
+        if len(data) != st.size:
+            raise EOFError('Unexpected EOF')
+        return st.unpack(data)
+
     def read_at_offset(self, offset, func):
         if offset == 0:
             return None
@@ -280,22 +448,42 @@ class Reader:
 
 def extract_farc(farc_path: str, output_dir: str):
     """Extract files from a FARC archive."""
-    # Parse FARC archive
-    archive = FarcArchive.from_file(farc_path)
-    
-    # Extract all entries
-    os.makedirs(output_dir, exist_ok=True)
-    
-    with open(farc_path, 'rb') as f:
-        for entry in archive.entries:
-            data = archive.extract_entry_data(f, entry)
+    # Map the archive once; the header and every entry are read from the same mapping
+    with open(farc_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        archive = FarcArchive()
+        archive.parse(mm)
+        
+        # Extract all entries
+        os.makedirs(output_dir, exist_ok=True)
+        
+        with memoryview(mm) as mv:
+            def extract_one(entry):
+                # Write file
+                out_path = os.path.join(output_dir, entry.name)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                with open(out_path, 'wb') as out:
+                    if entry.is_compressed:
+                        # own handle per entry: the read position must not be shared between threads
+                        with open(farc_path, 'rb') as src:
+                            return archive.write_entry_data(src, entry, out)
+                    # stored entries go straight from the mapping to disk
+                    return out.write(mv[entry.offset:entry.offset + entry.compressed_size])
             
-            # Write file
-            out_path = os.path.join(output_dir, entry.name)
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            with open(out_path, 'wb') as out:
-                out.write(data)
-            print(f"Extracted: {entry.name} ({len(data)} bytes)")
+            # zlib and file writes release the GIL, so entries extract in parallel
+            ex = None
+            if len(archive.entries) >= PARALLEL_EXTRACT_MIN_ENTRIES:
+                ex = ThreadPoolExecutor(max_workers=os.cpu_count())
+            try:
+                sizes = ex.map(extract_one, archive.entries) if ex else map(extract_one, archive.entries)
+                for entry, size in zip(archive.entries, sizes):
+                    log.info("Extracted: %s (%d bytes)", entry.name, size)
+            finally:
+                if ex:
+                    ex.shutdown()
+
+
+# SubTexture header: signature, width, height, format, id, data size
+_SUBTEX_HDR_STRUCTS = {endian: struct.Struct(endian + '6i') for endian in ('<', '>')}
 
 
 class SubTexture:
@@ -307,15 +495,12 @@ class SubTexture:
         self.data = b''
 
     def read(self, r: Reader):
-        sig = r.read_int32()
+        # fixed 24-byte header in one unpack
+        sig, self.width, self.height, self.format, self.id, data_size = r.unpack(_SUBTEX_HDR_STRUCTS[r.endian])
         if sig != TXP_SUBTEXTURE_SIG:
             raise ValueError(f'Invalid SubTexture signature: 0x{sig:08X}')
-        self.width = r.read_int32()
-        self.height = r.read_int32()
-        self.format = r.read_int32()
-        self.id = r.read_int32()
-        data_size = r.read_int32()
-        self.data = r.read_bytes(data_size)
+        # a view into the source buffer when possible, so mip blobs are not copied
+        self.data = r.read_view(data_size)
 
     def dump(self, out_dir, name_prefix):
         os.makedirs(out_dir, exist_ok=True)
@@ -325,31 +510,195 @@ class SubTexture:
         return path
 
 
-def decode_dxt_to_image(dxt_data: bytes, width: int, height: int, format_id: int) -> Image.Image:
-    """Decode DXT compressed data and return a PIL Image (RGBA)."""
-    if format_id == 6:  # DXT1 = BC1 (no alpha channel, but decode_bc1 returns RGBA anyway)
-        rgba_bytes = decode_bc1(dxt_data, width, height)
-    elif format_id == 9:  # DXT5 = BC3 (with alpha channel)
-        rgba_bytes = decode_bc3(dxt_data, width, height)
-    else:
+def _jit(**kwargs):
+    """numba.njit(**kwargs) when numba is installed, otherwise leave the function as plain Python."""
+    if njit is None:
+        return lambda fn: fn
+    return njit(**kwargs)
+
+
+@_jit(cache=True)
+def _u16(data, pos):
+    return np.uint32(data[pos]) | (np.uint32(data[pos + 1]) << np.uint32(8))
+
+
+@_jit(cache=True)
+def _u32(data, pos):
+    return _u16(data, pos) | (_u16(data, pos + 2) << np.uint32(16))
+
+
+@_jit(cache=True)
+def _rgb565(c, palette, k):
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    palette[k, 0] = (r << 3) | (r >> 2)
+    palette[k, 1] = (g << 2) | (g >> 4)
+    palette[k, 2] = (b << 3) | (b >> 2)
+
+
+@_jit(cache=True)
+def _bc1_color_block(data, pos, palette):
+    """Fill the 4-entry RGBA palette of the BC1 color block at data[pos:pos+8]."""
+    c0 = _u16(data, pos)
+    c1 = _u16(data, pos + 2)
+    _rgb565(c0, palette, 0)
+    _rgb565(c1, palette, 1)
+    for ch in range(3):
+        a = np.int32(palette[0, ch])
+        b = np.int32(palette[1, ch])
+        if c0 > c1:
+            palette[2, ch] = (2 * a + b) // 3
+            palette[3, ch] = (a + 2 * b) // 3
+        else:
+            palette[2, ch] = (a + b) // 2
+            palette[3, ch] = 0
+    # texture2ddecoder keeps every color opaque, including the c0 <= c1 "transparent" black
+    palette[:, 3] = 255
+
+
+@_jit(cache=True, parallel=True)
+def _bc1_decode(data, width, height, out):
+    """Decode BC1 blocks from a uint8 array into out[height, width, 4] (RGBA)."""
+    bw = (width + 3) // 4
+    bh = (height + 3) // 4
+    for by in prange(bh):
+        palette = np.empty((4, 4), np.uint8)
+        for bx in range(bw):
+            pos = (by * bw + bx) * 8
+            _bc1_color_block(data, pos, palette)
+            idx = _u32(data, pos + 4)
+            for t in range(16):
+                y = by * 4 + t // 4
+                x = bx * 4 + t % 4
+                if y < height and x < width:
+                    out[y, x, :] = palette[(idx >> np.uint32(2 * t)) & np.uint32(3)]
+
+
+@_jit(cache=True, parallel=True)
+def _bc3_decode(data, width, height, out):
+    """Decode BC3 blocks (8-byte alpha block + BC1 color block) into out[height, width, 4] (RGBA)."""
+    bw = (width + 3) // 4
+    bh = (height + 3) // 4
+    for by in prange(bh):
+        palette = np.empty((4, 4), np.uint8)
+        alphas = np.empty(8, np.int32)
+        for bx in range(bw):
+            pos = (by * bw + bx) * 16
+            a0 = np.int32(data[pos])
+            a1 = np.int32(data[pos + 1])
+            alphas[0] = a0
+            alphas[1] = a1
+            if a0 > a1:
+                for i in range(1, 7):
+                    alphas[i + 1] = ((7 - i) * a0 + i * a1) // 7
+            else:
+                for i in range(1, 5):
+                    alphas[i + 1] = ((5 - i) * a0 + i * a1) // 5
+                alphas[6] = 0
+                alphas[7] = 255
+            abits = np.uint64(_u32(data, pos + 2)) | (np.uint64(_u16(data, pos + 6)) << np.uint64(32))
+            _bc1_color_block(data, pos + 8, palette)
+            idx = _u32(data, pos + 12)
+            for t in range(16):
+                y = by * 4 + t // 4
+                x = bx * 4 + t % 4
+                if y < height and x < width:
+                    out[y, x, :] = palette[(idx >> np.uint32(2 * t)) & np.uint32(3)]
+                    out[y, x, 3] = alphas[(abits >> np.uint64(3 * t)) & np.uint64(7)]
+
+
+_scratch = threading.local()
+
+
+def _decode_scratch(nbytes: int) -> np.ndarray:
+    # per-thread decode buffer, grown to the largest texture seen and reused after that
+    buf = getattr(_scratch, 'buf', None)
+    if buf is None or buf.size < nbytes:
+        buf = _scratch.buf = np.empty(nbytes, dtype=np.uint8)
+    return buf
+
+
+def _rgba_out(out, width: int, height: int) -> np.ndarray:
+    if out is None:
+        return np.empty((height, width, 4), dtype=np.uint8)
+    if out.size < width * height * 4:
+        raise ValueError(f'out buffer too small: {out.size} < {width * height * 4} bytes')
+    return out[:width * height * 4].reshape((height, width, 4))
+
+
+# format_id -> (JIT kernel, bytes per 4x4 block); empty without numba, so every
+# format goes through texture2ddecoder
+_BC_KERNELS = {} if njit is None else {
+    6: (_bc1_decode, 8),   # DXT1 = BC1
+    9: (_bc3_decode, 16),  # DXT5 = BC3
+}
+
+# format_id -> texture2ddecoder function (returns BGRA bytes)
+_BGRA_DECODERS = {
+    6: decode_bc1,  # DXT1 = BC1 (no alpha channel, but decode_bc1 returns RGBA anyway)
+    9: decode_bc3,  # DXT5 = BC3 (with alpha channel)
+}
+
+
+def _decode_bc_blocks(raw, width: int, height: int, format_id: int, out=None) -> np.ndarray:
+    # JIT kernels decode block rows in parallel and write RGBA directly (no channel swap)
+    kernel, block_bytes = _BC_KERNELS[format_id]
+    needed = ((width + 3) // 4) * ((height + 3) // 4) * block_bytes
+    if len(raw) < needed:
+        raise ValueError(f'DXT data too short: {len(raw)} < {needed} bytes')
+    rgba_array = _rgba_out(out, width, height)
+    kernel(np.frombuffer(raw, dtype=np.uint8), width, height, rgba_array)
+    return rgba_array
+
+
+def _decode_dxt_bgra(dxt_data, width: int, height: int, format_id: int) -> bytes:
+    decoder = _BGRA_DECODERS.get(format_id)
+    if decoder is None:
         raise ValueError(f'Unsupported DXT format: {format_id}')
-    
-    # Convert bytes to numpy array
-    rgba_array = np.frombuffer(rgba_bytes, dtype=np.uint8).reshape((height, width, 4))
-    
-    # Swap B and R channels (BGR -> RGB)
-    rgba_array = rgba_array.copy()
-    rgba_array[:, :, [0, 2]] = rgba_array[:, :, [2, 0]]
-    
-    # Convert to PIL Image (RGBA) - avoid deprecated 'mode' parameter
-    img = Image.fromarray(rgba_array)
-    
-    return img
+    return decoder(dxt_data, width, height)
+
+
+def decode_dxt_to_image(dxt_data: bytes, width: int, height: int, format_id: int, out=None) -> Image.Image:
+    """Decode DXT compressed data and return a PIL Image (RGBA).
+    With out (a flat uint8 array of at least width*height*4), pixels are decoded into it
+    and the image shares that memory."""
+    if out is not None:
+        rgba_array = decode_dxt_to_ndarray(dxt_data, width, height, format_id, out)
+        return Image.frombuffer('RGBA', (width, height), rgba_array, 'raw', 'RGBA', 0, 1)
+    if format_id in _BC_KERNELS:
+        rgba_array = _decode_bc_blocks(dxt_data, width, height, format_id)
+        return Image.frombuffer('RGBA', (width, height), rgba_array, 'raw', 'RGBA', 0, 1)
+
+    bgra_bytes = _decode_dxt_bgra(dxt_data, width, height, format_id)
+    # PIL's BGRA unpacker swaps B and R while loading, so no numpy round-trip is needed
+    return Image.frombuffer('RGBA', (width, height), bgra_bytes, 'raw', 'BGRA', 0, 1)
+
+
+def decode_dxt_to_ndarray(dxt_data: bytes, width: int, height: int, format_id: int, out=None) -> np.ndarray:
+    """Decode DXT compressed data into a (height, width, 4) RGBA uint8 array, without PIL.
+    With out (a flat uint8 array of at least width*height*4), the result is a view into it."""
+    if format_id in _BC_KERNELS:
+        return _decode_bc_blocks(dxt_data, width, height, format_id, out)
+
+    bgra = np.frombuffer(_decode_dxt_bgra(dxt_data, width, height, format_id), dtype=np.uint8)
+    return np.take(bgra.reshape((height, width, 4)), [2, 1, 0, 3], axis=2, out=_rgba_out(out, width, height))
+
+
+# Per-subtexture metadata, one record per (array_index, mip); off is the data's
+# absolute position in the source, -1 where the offset table has no entry
+SUBTEXTURE_META_DTYPE = np.dtype([
+    ('w', '<i4'), ('h', '<i4'), ('fmt', '<i4'), ('id', '<i4'), ('off', '<i8'), ('size', '<i8'),
+])
 
 
 class Texture:
     def __init__(self):
-        self.subtextures = []  # 2D flattened as [array_index][mip]
+        # flattened as array_index * mip_count + mip; data_views holds the matching blobs
+        self.meta = np.zeros(0, dtype=SUBTEXTURE_META_DTYPE)
+        self.data_views = []
+        self.array_size = 0
+        self.mip_count = 0
         self.name:str = None
 
     def read(self, r: Reader):
@@ -372,40 +721,71 @@ class Texture:
         # prepare container
         self.array_size = max(1, array_size)
         self.mip_count = max(1, mip_count)
-        self.subtextures = [[None for _ in range(self.mip_count)] for _ in range(self.array_size)]
+        count = self.array_size * self.mip_count
+        self.meta = np.zeros(count, dtype=SUBTEXTURE_META_DTYPE)
+        self.meta['off'] = -1
+        self.data_views = [None] * count
 
         # read offsets table and load subtextures
         # offsets are stored sequentially for (array_index, mip)
-        for i in range(self.array_size):
-            for j in range(self.mip_count):
-                offset = r.read_offset()
-                if offset != 0:
-                    cur = r.tell()
-                    r.seek(r.base + offset)
-                    st = SubTexture()
-                    st.read(r)
-                    self.subtextures[i][j] = st
-                    r.seek(cur)
+        offsets = r.read_offsets(count)
+        end = r.tell()
+        for k, offset in enumerate(offsets):
+            if offset != 0:
+                r.seek(r.base + offset)
+                st = SubTexture()
+                st.read(r)
+                data_off = r.tell() - len(st.data)
+                self.meta[k] = (st.width, st.height, st.format, st.id, data_off, len(st.data))
+                self.data_views[k] = st.data
+        r.seek(end)
         
         r.pop_base()
 
+    def subtexture(self, k: int) -> 'SubTexture':
+        """SubTexture for flat index k (array_index * mip_count + mip), or None if absent."""
+        data = self.data_views[k]
+        if data is None:
+            return None
+        m = self.meta[k]
+        st = SubTexture()
+        st.width, st.height, st.format, st.id = int(m['w']), int(m['h']), int(m['fmt']), int(m['id'])
+        st.data = data
+        return st
+
+    @cached_property
+    def subtextures(self) -> list[list['SubTexture']]:
+        """Nested [array_index][mip] SubTexture objects, built from meta on first use."""
+        return [[self.subtexture(i * self.mip_count + j) for j in range(self.mip_count)]
+                for i in range(self.array_size)]
+
+    def at(self, i: int, j: int) -> 'SubTexture':
+        """SubTexture for array index i, mip j (None if absent); same as subtextures[i][j]."""
+        return self.subtexture(i * self.mip_count + j)
+
     def dump_subtextures(self, out_dir, tex_idx):
         paths = []
-        for i in range(self.array_size):
-            for j in range(self.mip_count):
-                st = self.subtextures[i][j]
-                if st:
-                    namep = f"tex{tex_idx}_arr{i}_mip{j}"
-                    paths.append(st.dump(out_dir, namep))
+        # single pass over the flat table; only present slots get a SubTexture
+        for k, data in enumerate(self.data_views):
+            if data is not None:
+                i, j = divmod(k, self.mip_count)
+                namep = f"tex{tex_idx}_arr{i}_mip{j}"
+                paths.append(self.subtexture(k).dump(out_dir, namep))
         return paths
     
+    def base_array(self, out=None) -> np.ndarray:
+        """Decode the base mip into an RGBA array (a view into out if given); None if absent."""
+        if self.data_views and self.data_views[0] is not None:
+            m = self.meta[0]
+            return decode_dxt_to_ndarray(self.data_views[0], int(m['w']), int(m['h']), int(m['fmt']), out)
+        return None
+
     @cached_property
     def image(self)->Image.Image:
         """Get the base (full resolution) texture as a PIL Image."""
-        if (len(self.subtextures) > 0 and len(self.subtextures[0]) > 0 and 
-            self.subtextures[0][0] is not None):
-            st = self.subtextures[0][0]
-            return decode_dxt_to_image(st.data, st.width, st.height, st.format)
+        if self.data_views and self.data_views[0] is not None:
+            m = self.meta[0]
+            return decode_dxt_to_image(self.data_views[0], int(m['w']), int(m['h']), int(m['fmt']))
         return None
 
 
@@ -413,6 +793,7 @@ class TextureSet:
     def __init__(self):
         self.textures:list[Texture] = []
         self.texture_names = {}  # idx -> name
+        self._flipped = {}  # idx -> upright RGBA array, shared by every sprite on that texture
 
 
     def __len__(self):
@@ -433,7 +814,7 @@ class TextureSet:
         tex_count = r.read_int32()
         _ = r.read_int32()  # textureCountWithRubbish
         # offsets to textures (relative to TextureSet base)
-        offsets = [r.read_offset() for _ in range(tex_count)]
+        offsets = r.read_offsets(tex_count)
         for off in offsets:
             if off != 0:
                 cur = r.tell()
@@ -448,10 +829,7 @@ class TextureSet:
             cur = r.tell()
             # First, read all name offsets
             r.seek(texture_names_offset)
-            name_offsets = []
-            for i in range(tex_count):
-                name_offset = struct.unpack('<I', r.f.read(4))[0]
-                name_offsets.append(name_offset)
+            name_offsets = struct.unpack(f'<{tex_count}I', r.f.read(4 * tex_count)) if tex_count > 0 else ()
             
             # Then, read each name from its offset
             for i, name_offset in enumerate(name_offsets):
@@ -470,6 +848,95 @@ class TextureSet:
             all_paths += tex.dump_subtextures(out_dir, idx)
         return all_paths
 
+    def get_flipped_array(self, idx: int) -> np.ndarray:
+        """Base image of texture idx flipped upright, as an RGBA array (None if there is no base mip).
+        Flipped once per texture; sprites crop views out of it."""
+        arr = self._flipped.get(idx)
+        if arr is None:
+            tex = self.textures[idx]
+            if 'image' in tex.__dict__:
+                # already decoded (e.g. by decode_all_base_images)
+                img = tex.image
+                src = None if img is None else np.asarray(img)
+            else:
+                # decode into this thread's reusable buffer; only the flipped copy is kept
+                m = tex.meta[0] if len(tex.meta) else None
+                nbytes = int(m['w']) * int(m['h']) * 4 if m is not None else 0
+                src = tex.base_array(_decode_scratch(nbytes))
+            if src is None:
+                return None
+            arr = self._flipped[idx] = np.ascontiguousarray(src[::-1])
+        return arr
+
+    def decode_all_base_images(self, indices=None) -> list[Image.Image]:
+        """Decode every texture's base image up front, filling each Texture.image cache.
+        If indices is given, only those textures are decoded, in that order.
+        Textures that have no base mip or fail to decode come back as None."""
+        textures = self.textures if indices is None else [self.textures[i] for i in indices]
+        # the numba kernels already spread one texture over all cores (and must not be
+        # launched from several threads at once); texture2ddecoder needs the pool instead
+        if njit is not None or len(textures) <= 1:
+            return [_try_base_image(tex) for tex in textures]
+        with ThreadPoolExecutor(max_workers=min(len(textures), os.cpu_count() or 1)) as ex:
+            return list(ex.map(_try_base_image, textures))
+
+    def decode_flipped_arrays(self, indices=None) -> list[np.ndarray]:
+        """Fill the get_flipped_array cache up front (for indices, or every texture).
+        Decoding goes through the per-thread scratch buffer, so unlike decode_all_base_images
+        no Texture.image is kept next to the flipped copy.
+        Textures that have no base mip or fail to decode come back as None."""
+        indices = range(len(self.textures)) if indices is None else list(indices)
+        # same threading policy as decode_all_base_images
+        if njit is not None or len(indices) <= 1:
+            return [self._try_flipped_array(i) for i in indices]
+        with ThreadPoolExecutor(max_workers=min(len(indices), os.cpu_count() or 1)) as ex:
+            return list(ex.map(self._try_flipped_array, indices))
+
+    def _try_flipped_array(self, idx: int) -> np.ndarray:
+        # errors surface again, with context, when the sprite is cropped from this texture
+        try:
+            return self.get_flipped_array(idx)
+        except Exception:
+            return None
+
+
+def _try_base_image(tex: Texture) -> Image.Image:
+    # errors surface again, with context, when the caller touches tex.image itself
+    try:
+        return tex.image
+    except Exception:
+        return None
+
+
+class ImagePool:
+    """Recycles PIL images by (mode, size) so repeated crops reuse pixel buffers.
+    Keeps at most max_per_size free images per (mode, size) and max_sizes distinct keys;
+    the least recently released size is dropped first."""
+    def __init__(self, max_per_size: int = 2, max_sizes: int = 8):
+        self.max_per_size = max_per_size
+        self.max_sizes = max_sizes
+        # insertion order doubles as recency: release() moves its key to the end
+        self._free: dict[tuple[str, tuple[int, int]], list[Image.Image]] = {}
+
+    def acquire(self, mode: str, size: tuple[int, int]) -> Image.Image:
+        free = self._free.get((mode, size))
+        if free:
+            return free.pop()
+        return Image.new(mode, size)
+
+    def release(self, img: Image.Image):
+        key = (img.mode, img.size)
+        free = self._free.pop(key, [])
+        if len(free) < self.max_per_size:
+            free.append(img)
+        self._free[key] = free
+        while len(self._free) > self.max_sizes:
+            del self._free[next(iter(self._free))]
+
+
+# Sprite record: texture_index, reserved, rect begin/end (4 floats), x, y, width, height
+_SPRITE_STRUCTS = {endian: struct.Struct(endian + '2I8f') for endian in ('<', '>')}
+
 
 class Sprite:
     def __init__(self):
@@ -483,47 +950,129 @@ class Sprite:
         self.name = None
 
     def read(self, r: Reader):
-        self.texture_index = r.read_uint32()
-        _ = r.read_uint32()  # reserved
-        bx = r.read_float(); by = r.read_float()
-        ex = r.read_float(); ey = r.read_float()
-        self.rect_begin = (bx, by)
-        self.rect_end = (ex, ey)
-        self.x = r.read_float(); self.y = r.read_float()
-        self.width = r.read_float(); self.height = r.read_float()
+        self._set_fields(r.unpack(_SPRITE_STRUCTS[r.endian]))
+
+    def _set_fields(self, t):
+        self.texture_index = t[0]  # t[1] is reserved
+        self.rect_begin = (t[2], t[3])
+        self.rect_end = (t[4], t[5])
+        self.x, self.y, self.width, self.height = t[6:10]
     
-    def crop_from_texture(self, texture_image: Image.Image) -> Image.Image:
-        """Crop this sprite from the texture using x, y, width, height."""
-        if texture_image is None:
+    def crop_from_texture(self, texture: np.ndarray, pool: ImagePool = None) -> Image.Image:
+        """Crop this sprite from the texture using x, y, width, height.
+        texture is the upright array from TextureSet.get_flipped_array; a decoded
+        (still upside-down) PIL image is flipped here instead.
+        If pool is given, the pixels are copied into a recycled image from it."""
+        if texture is None:
             return None
         
-        # Flip the texture vertically first (decode produces upside-down image)
-        texture_image = texture_image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        if isinstance(texture, Image.Image):
+            # Flip the texture vertically first (decode produces upside-down image)
+            texture = np.asarray(texture)[::-1]
         
         # Use x, y, width, height directly (they are in pixel coordinates)
         x1 = int(self.x)
         y1 = int(self.y)
         x2 = x1 + int(self.width)
         y2 = y1 + int(self.height)
+        if x2 < x1:
+            raise ValueError("Coordinate 'right' is less than 'left'")
+        if y2 < y1:
+            raise ValueError("Coordinate 'lower' is less than 'upper'")
+        
+        h, w = texture.shape[:2]
+        if x1 >= 0 and y1 >= 0 and x2 <= w and y2 <= h:
+            crop = texture[y1:y2, x1:x2]
+        else:
+            # the part outside the texture is transparent black, as with Image.crop
+            crop = np.zeros((y2 - y1, x2 - x1) + texture.shape[2:], dtype=texture.dtype)
+            sx1, sy1, sx2, sy2 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+            if sx1 < sx2 and sy1 < sy2:
+                crop[sy1 - y1:sy2 - y1, sx1 - x1:sx2 - x1] = texture[sy1:sy2, sx1:sx2]
         
-        # Crop using (left, top, right, bottom)
-        return texture_image.crop((x1, y1, x2, y2))
+        if pool is not None and crop.ndim == 3 and crop.shape[2] == 4 and crop.size:
+            img = pool.acquire('RGBA', (x2 - x1, y2 - y1))
+            img.frombytes(np.ascontiguousarray(crop))
+            return img
+        
+        return Image.fromarray(crop)
 
 
 class SpriteSet:
     def __init__(self):
         self.sprites:list[Sprite] = []
         self.texture_set:TextureSet = None
+        self.image_pool:ImagePool = None
+
+    def referenced_textures(self, indices=None) -> list[int]:
+        """Sorted indices of the textures at least one sprite (of indices, if given) lives on."""
+        n = len(self.texture_set) if self.texture_set is not None else 0
+        sprites = self.sprites if indices is None else map(self.sprites.__getitem__, indices)
+        return sorted({s.texture_index for s in sprites if 0 <= s.texture_index < n})
+
+    def visible_sprites(self) -> list[int]:
+        """Indices of the sprites whose crop rect is non-empty and overlaps their texture.
+        Bounds come from the base mip metadata, so nothing is decoded; sprites whose texture
+        has no base mip are kept (cropping them fails as usual)."""
+        n = len(self.texture_set) if self.texture_set is not None else 0
+        visible = []
+        for idx, s in enumerate(self.sprites):
+            x, y, w, h = int(s.x), int(s.y), int(s.width), int(s.height)
+            if w <= 0 or h <= 0:
+                continue
+            tex = self.texture_set.textures[s.texture_index] if 0 <= s.texture_index < n else None
+            if tex is not None and len(tex.meta) and tex.meta['off'][0] >= 0:
+                tw, th = int(tex.meta['w'][0]), int(tex.meta['h'][0])
+                if x >= tw or y >= th or x + w <= 0 or y + h <= 0:
+                    continue
+            visible.append(idx)
+        return visible
+
+    def _prepare_iteration(self, indices=None) -> list[int]:
+        # textures none of the iterated sprites point at are never decoded
+        indices = range(len(self.sprites)) if indices is None else list(indices)
+        if self.texture_set is not None:
+            self.texture_set.decode_flipped_arrays(self.referenced_textures(indices))
+        return indices
 
     def __iter__(self)->Generator[tuple[Sprite,Image.Image]]:
-        for sprite in self.sprites:
-            tex_idx = sprite.texture_index
-            if tex_idx >= len(self.texture_set) or self.texture_set.textures[tex_idx] is None:
-                raise ValueError(f"{sprite.name}: texture {tex_idx} not available")
-            sprite_img = sprite.crop_from_texture(self.texture_set.textures[tex_idx].image)
-            if sprite_img is None:
-                raise ValueError(f"{sprite.name}: failed to crop")
-            yield sprite,sprite_img
+        for idx in self._prepare_iteration():
+            yield self.sprites[idx],self.decode_one(idx)
+
+    def iter_by_texture(self, indices=None)->Generator[tuple[int,Sprite,Image.Image]]:
+        """Like iteration, but grouped by texture (archive order within a texture) and
+        yielding each sprite's index too, so consecutive crops hit the same texture array.
+        If indices is given, only those sprites are cropped (e.g. visible_sprites())."""
+        order = sorted(self._prepare_iteration(indices), key=lambda i: self.sprites[i].texture_index)
+        for _, group in itertools.groupby(order, key=lambda i: self.sprites[i].texture_index):
+            # one texture lookup per group instead of per sprite
+            group = list(group)
+            texture = self._texture_for(self.sprites[group[0]])
+            for idx in group:
+                sprite = self.sprites[idx]
+                yield idx, sprite, sprite.crop_from_texture(texture, self.image_pool)
+
+    def index_by_name(self, substr: str) -> int | None:
+        """Index of the first sprite whose name contains substr, or None."""
+        for idx, sprite in enumerate(self.sprites):
+            if sprite.name and substr in sprite.name:
+                return idx
+        return None
+
+    def decode_one(self, idx: int) -> Image.Image:
+        """Crop a single sprite, decoding only the texture it lives on."""
+        sprite = self.sprites[idx]
+        return sprite.crop_from_texture(self._texture_for(sprite), self.image_pool)
+
+    def _texture_for(self, sprite: Sprite) -> np.ndarray:
+        # upright array of the texture sprite lives on; raises if it cannot be cropped from
+        tex_idx = sprite.texture_index
+        if tex_idx >= len(self.texture_set) or self.texture_set.textures[tex_idx] is None:
+            raise ValueError(f"{sprite.name}: texture {tex_idx} not available")
+        texture = self.texture_set.get_flipped_array(tex_idx)
+        if texture is None:
+            raise ValueError(f"{sprite.name}: failed to crop")
+        return texture
 
     def read(self, r: Reader):
         # SpriteSet is at file position 0, so base is 0
@@ -551,9 +1100,15 @@ class SpriteSet:
         if sprites_offset != 0:
             cur = r.tell()
             r.seek(r.base + sprites_offset)
-            for _ in range(sprite_count):
+            # one read for the whole table, then unpack records from the buffer
+            st = _SPRITE_STRUCTS[r.endian]
+            size = st.size * max(0, sprite_count)
+            data = r.read_view(size)
+            if len(data) != size:
+                raise EOFError('Unexpected EOF')
+            for t in st.iter_unpack(data):
                 s = Sprite()
-                s.read(r)
+                s._set_fields(t)
                 self.sprites.append(s)
             r.seek(cur)
 
@@ -561,10 +1116,7 @@ class SpriteSet:
         if sprite_names_offset != 0:
             cur = r.tell()
             r.seek(r.base + sprite_names_offset)
-            name_offsets = []
-            for _ in range(sprite_count):
-                offset = r.read_offset()
-                name_offsets.append(offset)
+            name_offsets = r.read_offsets(sprite_count)
             
             # Read names from their absolute file positions
             for i, offset in enumerate(name_offsets):
@@ -576,8 +1128,73 @@ class SpriteSet:
             r.seek(cur)
 
 
+# TXP magics in both byte orders, as they read from a little-endian 32-bit word
+_TXP_SIG_WORDS = np.array(
+    [sig for sig in (TXP_TEXSET_SIG, TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5, TXP_SUBTEXTURE_SIG)
+     for sig in (sig, int.from_bytes(sig.to_bytes(4, 'little'), 'big'))],
+    dtype='<u4')
+
+
+def find_txp_signatures(data) -> np.ndarray:
+    """Return the offsets of every TXP signature (LE or BE) in a bytes-like buffer, ascending."""
+    # one vectorised pass per byte phase instead of a find() loop per pattern,
+    # so signatures at unaligned offsets are still found; each phase fills its
+    # slots of a per-offset mask, so flatnonzero yields them already sorted
+    mask = np.zeros(max(len(data) - 3, 0), dtype=bool)
+    for phase in range(4):
+        count = (len(data) - phase) // 4
+        if count <= 0:
+            break
+        words = np.frombuffer(data, dtype='<u4', count=count, offset=phase)
+        mask[phase::4] = np.isin(words, _TXP_SIG_WORDS)
+    return np.flatnonzero(mask)
+
+
+# raw 4-byte signature (either byte order) -> (little-endian?, signature)
+_TXP_SIG_TABLE = {
+    struct.pack(endian + 'I', sig): (endian == '<', sig)
+    for endian in ('<', '>')
+    for sig in (TXP_TEXSET_SIG, TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5, TXP_SUBTEXTURE_SIG)
+}
+
+
+def _dump_embedded_texset(r: Reader, off, outdir):
+    ts = TextureSet()
+    ts.read(r)
+    paths = ts.dump_all(outdir)
+    log.info('At offset %d: wrote %d subtexture blobs to %s', off, len(paths), outdir)
+
+
+def _dump_embedded_texture(r: Reader, off, outdir):
+    tex = Texture()
+    tex.read(r)
+    paths = tex.dump_subtextures(outdir, 0)
+    log.info('At offset %d: wrote %d subtexture blobs to %s', off, len(paths), outdir)
+
+
+def _dump_embedded_subtexture(r: Reader, off, outdir):
+    st = SubTexture()
+    st.read(r)
+    os.makedirs(outdir, exist_ok=True)
+    p = st.dump(outdir, f'sub_{off}')
+    log.info('At offset %d: wrote subtexture blob to %s', off, p)
+
+
+# block handlers for parse_txd's embedded scan, keyed by signature; the reader is at the block start
+_EMBEDDED_DUMPERS = {
+    TXP_TEXSET_SIG: _dump_embedded_texset,
+    TXP_TEXTURE_SIG_V4: _dump_embedded_texture,
+    TXP_TEXTURE_SIG_V5: _dump_embedded_texture,
+    TXP_SUBTEXTURE_SIG: _dump_embedded_subtexture,
+}
+
+
 def parse_txd(path):
-    with open(path, 'rb') as f:
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size < 4:
+            raise ValueError('File too small')
+        # not closed explicitly: subtexture blobs are views into the mapping and keep it alive
+        f = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
         r = Reader(f)
         # detect whether file is TextureSet, single Texture, or SubTexture
         cur = f.tell()
@@ -596,7 +1213,7 @@ def parse_txd(path):
             ts.read(r)
             out = os.path.join(os.path.dirname(path), os.path.basename(path) + '_subtextures')
             paths = ts.dump_all(out)
-            print(f'Wrote {len(paths)} subtexture blobs to {out}')
+            log.info('Wrote %d subtexture blobs to %s', len(paths), out)
 
         elif le == TXP_TEXTURE_SIG_V4 or le == TXP_TEXTURE_SIG_V5 or be == TXP_TEXTURE_SIG_V4 or be == TXP_TEXTURE_SIG_V5:
             # single texture
@@ -607,7 +1224,7 @@ def parse_txd(path):
             tex.read(r)
             out = os.path.join(os.path.dirname(path), os.path.basename(path) + '_subtextures')
             paths = tex.dump_subtextures(out, 0)
-            print(f'Wrote {len(paths)} subtexture blobs to {out}')
+            log.info('Wrote %d subtexture blobs to %s', len(paths), out)
 
         elif le == TXP_SUBTEXTURE_SIG or be == TXP_SUBTEXTURE_SIG:
             if be == TXP_SUBTEXTURE_SIG and le != TXP_SUBTEXTURE_SIG:
@@ -617,94 +1234,36 @@ def parse_txd(path):
             out = os.path.join(os.path.dirname(path), os.path.basename(path) + '_subtextures')
             os.makedirs(out, exist_ok=True)
             p = st.dump(out, 'sub0')
-            print(f'Wrote subtexture blob to {p}')
+            log.info('Wrote subtexture blob to %s', p)
 
         else:
             # try scanning file for embedded TXP signatures
-            f.seek(0)
-            data = f.read()
-            hits = []
-            patterns = [
-                struct.pack('<I', TXP_TEXSET_SIG),
-                struct.pack('<I', TXP_TEXTURE_SIG_V4),
-                struct.pack('<I', TXP_TEXTURE_SIG_V5),
-                struct.pack('<I', TXP_SUBTEXTURE_SIG),
-            ]
-            # also consider big-endian byte sequences
-            patterns_be = [p[::-1] for p in patterns]
-            all_patterns = set(patterns + patterns_be)
-
-            for pat in all_patterns:
-                start = 0
-                while True:
-                    idx = data.find(pat, start)
-                    if idx == -1:
-                        break
-                    hits.append(idx)
-                    start = idx + 1
+            hits = find_txp_signatures(f)
 
-            if not hits:
+            if len(hits) == 0:
                 raise ValueError(f'Unknown signature: LE=0x{le:08X} BE=0x{be:08X} and no embedded TXP found')
 
             found_any = 0
-            for off in sorted(set(hits)):
+            # per-block output dirs only differ by offset
+            outdir_prefix = os.path.join(os.path.dirname(path), f"{os.path.basename(path)}_embedded_")
+            for off in hits.tolist():
+                # one lookup on the raw bytes gives both the byte order and the block type
+                info = _TXP_SIG_TABLE.get(f[off:off + 4])
+                if info is None:
+                    continue
+                little, sig = info
                 try:
-                    # determine endianness for this candidate by peeking raw bytes
-                    raw = data[off:off+4]
-                    le_sig = struct.unpack('<I', raw)[0]
-                    be_sig = struct.unpack('>I', raw)[0]
-
-                    valid_sigs = (TXP_TEXSET_SIG, TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5, TXP_SUBTEXTURE_SIG)
-
-                    if le_sig in valid_sigs and be_sig not in valid_sigs:
-                        r.set_endian(True)
-                    elif be_sig in valid_sigs and le_sig not in valid_sigs:
-                        r.set_endian(False)
-                    elif le_sig in valid_sigs:
-                        r.set_endian(True)
-                    elif be_sig in valid_sigs:
-                        r.set_endian(False)
-                    else:
-                        # nothing to do
-                        continue
-
+                    r.set_endian(little)
                     # seek to the signature start and set base for in-block offsets
                     r.seek(off)
                     r.push_base(off)
 
-                    sig = r.read_int32()
-                    base_name = os.path.basename(path)
-                    outdir = os.path.join(os.path.dirname(path), f"{base_name}_embedded_{off}_subtextures")
-
-                    if sig == TXP_TEXSET_SIG:
-                        # ensure reader positioned at start of texture set
-                        r.seek(off)
-                        ts = TextureSet()
-                        ts.read(r)
-                        paths = ts.dump_all(outdir)
-                        print(f'At offset {off}: wrote {len(paths)} subtexture blobs to {outdir}')
-                        found_any += 1
-
-                    elif sig in (TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5):
-                        r.seek(off)
-                        tex = Texture()
-                        tex.read(r)
-                        paths = tex.dump_subtextures(outdir, 0)
-                        print(f'At offset {off}: wrote {len(paths)} subtexture blobs to {outdir}')
-                        found_any += 1
-
-                    elif sig == TXP_SUBTEXTURE_SIG:
-                        r.seek(off)
-                        st = SubTexture()
-                        st.read(r)
-                        os.makedirs(outdir, exist_ok=True)
-                        p = st.dump(outdir, f'sub_{off}')
-                        print(f'At offset {off}: wrote subtexture blob to {p}')
-                        found_any += 1
+                    _EMBEDDED_DUMPERS[sig](r, off, f"{outdir_prefix}{off}_subtextures")
+                    found_any += 1
 
                 except Exception as ex:
                     # ignore parse errors for this hit and continue
-                    print(f'Failed to parse at offset {off}: {ex}')
+                    log.warning('Failed to parse at offset %d: %s', off, ex)
                 finally:
                     # restore base stack (pop the push done earlier if present)
                     try:
@@ -726,250 +1285,386 @@ def parse_spr(path):
             print(i, s.name, 'tex=', s.texture_index, 'x,y,w,h=', s.x, s.y, s.width, s.height)
 
 
+def _texture_summary(index, tex: Texture):
+    # base mip (array 0, mip 0) details straight from the metadata table
+    base = tex.meta[0] if len(tex.meta) > 0 and tex.meta['off'][0] >= 0 else None
+    format_id = int(base['fmt']) if base is not None else None
+    format_name = TEXTURE_FORMAT_MAP.get(format_id, f'UNKNOWN_{format_id}') if format_id is not None else None
+    return {
+        'index': index,
+        'name': tex.name,
+        'array_size': tex.array_size,
+        'mip_count': tex.mip_count,
+        'base_width': int(base['w']) if base is not None else None,
+        'base_height': int(base['h']) if base is not None else None,
+        'base_format': format_name or format_id,
+    }
+
+
+def _summarize_texset(r: Reader, off):
+    # Try to find SpriteSet header before this TextureSet to get texture_names_offset
+    texture_names_offset_to_use = 0
+    # Look backwards for SpriteSet header (offset typically 0x00 or nearby): the candidates
+    # are the 4-byte words from off - 1000 on, tested for the (all-zero, so byte-order
+    # independent) SpriteSet signature in one numpy pass over the window
+    start = max(0, off - 1000)
+    r.seek(start)
+    window = r.read_view(4 * len(range(start, off, 4)))
+    words = np.frombuffer(window, dtype=np.uint32, count=len(window) // 4)
+    for i in np.flatnonzero(words == TXP_SPRITESET_SIG).tolist():
+        try:
+            # Found SpriteSet, skip sig, textures_offset, tex_count, sprite_count and
+            # sprites_offset (4 bytes each) to get texture_names_offset
+            r.seek(start + 4 * i + 20)
+            texture_names_offset_to_use = r.read_uint32()
+            break
+        except EOFError:
+            pass
+    
+    r.seek(off)
+    ts = TextureSet()
+    ts.read(r, texture_names_offset=texture_names_offset_to_use)
+    texs = [_texture_summary(ti, tex) for ti, tex in enumerate(ts.textures)]
+    return {'offset': off, 'type': 'TextureSet', 'textures': texs}
+
+
+def _summarize_texture(r: Reader, off):
+    tex = Texture()
+    tex.read(r)
+    return {'offset': off, 'type': 'Texture', 'textures': [_texture_summary(0, tex)]}
+
+
+def _summarize_subtexture(r: Reader, off):
+    # summary only needs the fixed header: unpack it in place, no SubTexture object
+    _, width, height, fmt, id_, _ = r.read_fmt_at(off, _SUBTEX_HDR_STRUCTS[r.endian])
+    return {'offset': off, 'type': 'SubTexture', 'width': width, 'height': height, 'format': fmt, 'id': id_}
+
+
+# block summarizers for collect_txp_blocks, keyed by signature; the reader is at the block start
+_BLOCK_SUMMARIZERS = {
+    TXP_TEXSET_SIG: _summarize_texset,
+    TXP_TEXTURE_SIG_V4: _summarize_texture,
+    TXP_TEXTURE_SIG_V5: _summarize_texture,
+    TXP_SUBTEXTURE_SIG: _summarize_subtexture,
+}
+
+
 def collect_txp_blocks(path):
     """Scan file and return list of TXP-like blocks with offsets and TextureSet/Texture info."""
     blocks = []
     with open(path, 'rb') as f:
-        data = f.read()
-    patterns = [
-        struct.pack('<I', TXP_TEXSET_SIG),
-        struct.pack('<I', TXP_TEXTURE_SIG_V4),
-        struct.pack('<I', TXP_TEXTURE_SIG_V5),
-        struct.pack('<I', TXP_SUBTEXTURE_SIG),
-    ]
-    patterns_be = [p[::-1] for p in patterns]
-    all_patterns = set(patterns + patterns_be)
-    hits = []
-    for pat in all_patterns:
-        start = 0
-        while True:
-            idx = data.find(pat, start)
-            if idx == -1:
-                break
-            hits.append(idx)
-            start = idx + 1
-
-    with open(path, 'rb') as f:
-        r = Reader(f)
-        for off in sorted(set(hits)):
+        if os.fstat(f.fileno()).st_size == 0:
+            return blocks
+        # one mapping serves both the signature scan and the structure reads
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    hits = find_txp_signatures(data)
+
+    r = Reader(data)
+    for off in hits.tolist():
+        info = _TXP_SIG_TABLE.get(data[off:off + 4])
+        if info is None:
+            continue
+        little, sig = info
+        try:
+            r.set_endian(little)
+            r.seek(off)
+            r.push_base(off)
+            blocks.append(_BLOCK_SUMMARIZERS[sig](r, off))
+        except Exception:
+            pass
+        finally:
             try:
-                raw = data[off:off+4]
-                le_sig = struct.unpack('<I', raw)[0]
-                be_sig = struct.unpack('>I', raw)[0]
-                valid_sigs = (TXP_TEXSET_SIG, TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5, TXP_SUBTEXTURE_SIG)
-                if le_sig in valid_sigs and be_sig not in valid_sigs:
-                    r.set_endian(True)
-                elif be_sig in valid_sigs and le_sig not in valid_sigs:
-                    r.set_endian(False)
-                elif le_sig in valid_sigs:
-                    r.set_endian(True)
-                elif be_sig in valid_sigs:
-                    r.set_endian(False)
-                else:
-                    continue
-
-                r.seek(off)
-                r.push_base(off)
-                sig = r.read_int32()
-                if sig == TXP_TEXSET_SIG:
-                    # parse texture set summary
-                    r.seek(off)
-                    
-                    # Try to find SpriteSet header before this TextureSet to get texture_names_offset
-                    texture_names_offset_to_use = 0
-                    # Look backwards for SpriteSet header (offset typically 0x00 or nearby)
-                    for search_off in range(max(0, off - 1000), off, 4):
-                        try:
-                            r.seek(search_off)
-                            test_sig = r.read_int32()
-                            if test_sig == TXP_SPRITESET_SIG:
-                                # Found SpriteSet, read its header to get texture_names_offset
-                                r.seek(search_off + 4)  # skip sig
-                                r.read_uint32()  # textures_offset (4 bytes)
-                                r.read_int32()  # tex_count (4 bytes)
-                                r.read_int32()  # sprite_count (4 bytes)
-                                r.read_uint32()  # sprites_offset (4 bytes)
-                                texture_names_offset_to_use = r.read_uint32()  # texture_names_offset (4 bytes)
-                                break
-                        except:
-                            pass
-                    
-                    r.seek(off)
-                    ts = TextureSet()
-                    ts.read(r, texture_names_offset=texture_names_offset_to_use)
-                    texs = []
-                    for ti, tex in enumerate(ts.textures):
-                        # get base mip subtexture (array 0, mip 0) if exists
-                        st = None
-                        if getattr(tex, 'subtextures', None):
-                            if len(tex.subtextures) > 0 and len(tex.subtextures[0]) > 0:
-                                st = tex.subtextures[0][0]
-                        format_id = st.format if st else None
-                        format_name = TEXTURE_FORMAT_MAP.get(format_id, f'UNKNOWN_{format_id}') if format_id is not None else None
-                        tex_name = getattr(tex, 'name', None)
-                        texs.append({
-                            'index': ti,
-                            'name': tex_name,
-                            'array_size': getattr(tex, 'array_size', 1),
-                            'mip_count': getattr(tex, 'mip_count', 1),
-                            'base_width': st.width if st else None,
-                            'base_height': st.height if st else None,
-                            'base_format': format_name or format_id,
-                        })
-                    blocks.append({'offset': off, 'type': 'TextureSet', 'textures': texs})
-
-                elif sig in (TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5):
-                    r.seek(off)
-                    tex = Texture()
-                    tex.read(r)
-                    st = None
-                    if len(tex.subtextures) > 0 and len(tex.subtextures[0]) > 0:
-                        st = tex.subtextures[0][0]
-                    format_id = st.format if st else None
-                    format_name = TEXTURE_FORMAT_MAP.get(format_id, f'UNKNOWN_{format_id}') if format_id is not None else None
-                    tex_name = getattr(tex, 'name', None)
-                    blocks.append({'offset': off, 'type': 'Texture', 'textures': [{
-                        'index': 0,
-                        'name': tex_name,
-                        'array_size': getattr(tex, 'array_size', 1),
-                        'mip_count': getattr(tex, 'mip_count', 1),
-                        'base_width': st.width if st else None,
-                        'base_height': st.height if st else None,
-                        'base_format': format_name or format_id,
-                    }]})
-
-                elif sig == TXP_SUBTEXTURE_SIG:
-                    r.seek(off)
-                    st = SubTexture()
-                    st.read(r)
-                    blocks.append({'offset': off, 'type': 'SubTexture', 'width': st.width, 'height': st.height, 'format': st.format, 'id': st.id})
-
+                r.pop_base()
             except Exception:
                 pass
-            finally:
-                try:
-                    r.pop_base()
-                except Exception:
-                    pass
 
     return blocks
 
 
-def export_base_mips(path, out_dir_base):
-    """Export only base mip (array 0, mip 0) for each texture found in TXP blocks."""
-    blocks = collect_txp_blocks(path)
+def export_base_mips(path, out_dir_base, blocks=None):
+    """Export only base mip (array 0, mip 0) for each texture found in TXP blocks.
+    Pass blocks already returned by collect_txp_blocks(path) to skip rescanning the file."""
+    if blocks is None:
+        blocks = collect_txp_blocks(path)
     exported = []
     with open(path, 'rb') as f:
-        r = Reader(f)
-        data = f.read()
-        for block in blocks:
-            off = block['offset']
-            # only handle TextureSet or single Texture blocks
-            if block['type'] not in ('TextureSet', 'Texture'):
-                continue
-            # parse again to access subtextures and dump base mip
-            r.seek(off)
-            r.push_base(off)
-            try:
-                sig = r.read_int32()
-                base_name = os.path.basename(path)
-                outdir = os.path.join(os.path.dirname(path), f"{base_name}_base_{off}")
-                if sig == TXP_TEXSET_SIG:
-                    r.seek(off)
-                    ts = TextureSet()
-                    ts.read(r)
-                    for ti, tex in enumerate(ts.textures):
-                        st = None
-                        if getattr(tex, 'subtextures', None) and len(tex.subtextures) > 0 and len(tex.subtextures[0]) > 0:
-                            st = tex.subtextures[0][0]
-                        if st:
-                            os.makedirs(outdir, exist_ok=True)
-                            p = st.dump(outdir, f"tex{ti}_base")
-                            exported.append(p)
-                elif sig in (TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5):
-                    r.seek(off)
-                    tex = Texture()
-                    tex.read(r)
-                    if len(tex.subtextures) > 0 and len(tex.subtextures[0]) > 0:
-                        st = tex.subtextures[0][0]
+        if not blocks or os.fstat(f.fileno()).st_size == 0:
+            return blocks, exported
+        # only the pages of the blocks being dumped are read in; base mip blobs are views into it
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    r = Reader(data)
+    # per-block output dirs only differ by offset
+    outdir_prefix = os.path.join(os.path.dirname(path), f"{os.path.basename(path)}_base_")
+    for block in blocks:
+        off = block['offset']
+        # only handle TextureSet or single Texture blocks
+        if block['type'] not in ('TextureSet', 'Texture'):
+            continue
+        info = _TXP_SIG_TABLE.get(data[off:off + 4])
+        if info is None:
+            continue
+        little, sig = info
+        # parse again to access subtextures and dump base mip
+        r.set_endian(little)
+        r.seek(off)
+        r.push_base(off)
+        try:
+            outdir = f"{outdir_prefix}{off}"
+            if sig == TXP_TEXSET_SIG:
+                ts = TextureSet()
+                ts.read(r)
+                for ti, tex in enumerate(ts.textures):
+                    st = tex.at(0, 0)
+                    if st:
                         os.makedirs(outdir, exist_ok=True)
-                        p = st.dump(outdir, "tex0_base")
+                        p = st.dump(outdir, f"tex{ti}_base")
                         exported.append(p)
-            except Exception:
-                pass
-            finally:
-                try:
-                    r.pop_base()
-                except Exception:
-                    pass
+            elif sig in (TXP_TEXTURE_SIG_V4, TXP_TEXTURE_SIG_V5):
+                tex = Texture()
+                tex.read(r)
+                st = tex.at(0, 0)
+                if st:
+                    os.makedirs(outdir, exist_ok=True)
+                    p = st.dump(outdir, "tex0_base")
+                    exported.append(p)
+        except Exception:
+            pass
+        finally:
+            r.pop_base()
 
     return blocks, exported
 
 
-def _load_bin_data(file_path: str) -> bytes:
+def _read_farc_bin_data(f) -> bytes:
     """
-    Load binary data from either .bin file or FARC archive.
-    Automatically detects file type by header.
+    Parse the FARC archive at the start of f and return the
+    decompressed data of its first entry.
+    """
+    archive = FarcArchive()
+    archive.parse(f)
+    
+    if not archive.entries:
+        raise ValueError("No entries found in FARC archive")
     
-    Returns: decompressed BIN data as bytes
+    entry = archive.entries[0]
+    bin_data = archive.extract_entry_data(f, entry)
+    log.debug("Extracted %s from FARC (%d bytes)", entry.name, len(bin_data))
+    return bin_data
+
+
+def SpriteSet_from_fileobj(f, name: str = '<fileobj>') -> SpriteSet:
     """
-    with open(file_path, 'rb') as f:
-        header = f.read(4).decode('ascii', errors='ignore')
+    Parse a SpriteSet from a seekable binary file object (open file, BytesIO or mmap).
+    Automatically detects FARC archives by header; raw BIN data is parsed in place.
+    """
+    f.seek(0)
+    header = f.read(4).decode('ascii', errors='ignore')
+    f.seek(0)
     
-    # Check if it's a FARC archive
     if header in ('FARC', 'FArC', 'FArc'):
-        print(f"Detected {header} archive format")
-        with open(file_path, 'rb') as f:
-            archive = FarcArchive()
-            archive.parse(f)
-            
-            if not archive.entries:
-                raise ValueError("No entries found in FARC archive")
-            
-            entry = archive.entries[0]
-            bin_data = archive.extract_entry_data(f, entry)
-            print(f"Extracted {entry.name} from FARC ({len(bin_data)} bytes)")
-            return bin_data
+        log.debug("Detected %s archive format", header)
+        bin_data = _read_farc_bin_data(f)
+        if not bin_data:
+            raise ValueError(f"Failed to read file data from file {name}")
+        ss = try_parse_sprites_from_bytes(bin_data)
     else:
-        # Treat as raw BIN file
-        print("Detected raw BIN format")
-        with open(file_path, 'rb') as f:
-            return f.read()
-
-def SpriteSet_from_file(filepath:str)->SpriteSet:
-    bin_data = _load_bin_data(filepath)
-    if not bin_data:
-        raise ValueError(f"Failed to read file data from file {filepath}")
-    ss = try_parse_sprites_from_bytes(bin_data)
+        log.debug("Detected raw BIN format")
+        ss = try_parse_sprites_from_fileobj(f)
     if not ss:
-        raise ValueError(f"Failed to parse sprites from {filepath}")
+        raise ValueError(f"Failed to parse sprites from {name}")
     return ss
 
+def SpriteSet_from_file(filepath:str)->SpriteSet:
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Failed to read file data from file {filepath}")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # subtexture blobs are views into the mapping, so it stays open until the SpriteSet is dropped
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return SpriteSet_from_fileobj(mm, filepath)
 
-def export_sprites_to_png(file_path: str, output_dir: str):
-    """Parse sprites from .bin or .farc file and export each sprite as PNG."""
-    os.makedirs(output_dir, exist_ok=True)
+
+# Max sprites in flight between each pipeline stage; bounds memory held by queued images/PNGs
+PIPELINE_DEPTH = 4
+
+
+# With processes > 1, PNG encoding fans out to worker processes from this many sprites on;
+# below it the process startup costs more than the parallel deflate saves
+PROCESS_ENCODE_MIN_SPRITES = 16
+
+
+def _save_png_job(job):
+    # top-level so ProcessPoolExecutor can pickle it
+    out_path, img, compress_level = job
+    img.save(out_path, format='PNG', optimize=False, compress_level=compress_level)
+
+
+def _png_encode_stage(q_in: queue.Queue, q_out: queue.Queue, compress_level: int, errors: list):
+    while (job := q_in.get()) is not None:
+        if errors:
+            continue  # keep draining so the producer never blocks on a full queue
+        try:
+            out_path, img = job
+            buf = io.BytesIO()
+            img.save(buf, format='PNG', optimize=False, compress_level=compress_level)
+            q_out.put((out_path, buf.getvalue()))
+        except Exception as e:
+            errors.append(e)
+    q_out.put(None)
+
+
+def _png_write_stage(q_in: queue.Queue, errors: list, dir_fd=None):
+    # with dir_fd, out_path is a bare file name opened relative to the already-open directory
+    opener = None
+    if dir_fd is not None:
+        opener = lambda path, flags: os.open(path, flags, 0o644, dir_fd=dir_fd)
+    while (job := q_in.get()) is not None:
+        if errors:
+            continue
+        try:
+            out_path, data = job
+            with open(out_path, 'wb', opener=opener) as wf:
+                wf.write(data)
+        except Exception as e:
+            errors.append(e)
+
+
+def export_sprites_to_png(file_path: str, output_dir: str, compress_level: int = 1, ensure_dir: bool = True,
+                          processes: int = 1):
+    """
+    Parse sprites from .bin or .farc file and export each sprite as PNG.
+    compress_level is the zlib level (0-9); the low default favors export speed over file size.
+    Pass ensure_dir=False when the caller has already created output_dir.
+    processes > 1 encodes large sprite sets in up to that many worker processes (started with
+    forkserver/spawn, so the calling script needs an `if __name__ == '__main__'` guard);
+    the default keeps everything in this process's threaded pipeline.
+    """
+    if ensure_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
     sprite_set = SpriteSet_from_file(filepath=file_path)
     
-    print(f"Found {len(sprite_set.sprites)} sprites and {len(sprite_set.texture_set.textures)} textures")
+    log.info("Found %d sprites and %d textures", len(sprite_set.sprites), len(sprite_set.texture_set.textures))
+    visible = _exportable_sprites(sprite_set)
+    
+    workers = min(processes, os.cpu_count() or 1)
+    if workers > 1 and len(visible) >= PROCESS_ENCODE_MIN_SPRITES:
+        exported = _export_sprites_parallel(sprite_set, output_dir, compress_level, workers, visible)
+        log.info("Exported %d sprites to %s", exported, output_dir)
+        return
     
-    # Export sprites
+    # Export sprites: decode/crop here -> PNG encode thread -> file write thread,
+    # with bounded queues so a slow stage applies backpressure instead of piling up images
+    q_enc = queue.Queue(maxsize=PIPELINE_DEPTH)
+    q_write = queue.Queue(maxsize=PIPELINE_DEPTH)
+    errors = []
+    # open output_dir once and create every PNG relative to it, so the kernel does not
+    # walk the full output path again for each sprite
+    dir_fd = os.open(output_dir, os.O_RDONLY) if os.open in os.supports_dir_fd else None
+    stages = [
+        threading.Thread(target=_png_encode_stage, args=(q_enc, q_write, compress_level, errors)),
+        threading.Thread(target=_png_write_stage, args=(q_write, errors, dir_fd)),
+    ]
+    for t in stages:
+        t.start()
     exported = 0
-    for sprite,img in sprite_set:
-        sprite_name = sprite.name or f"sprite_{sprite.texture_index}_{exported}"
-        tex_idx = sprite.texture_index
-        
-        out_path = os.path.join(output_dir, f"{sprite_name}.png")
-        img.save(out_path)
-        exported+=1
-        texture_name = sprite_set.texture_set.textures[sprite.texture_index].name or f"texture_{tex_idx}"
-        print(f"  Exported: {sprite_name} ({img.size}) x={int(sprite.x)},y={int(sprite.y)},w={int(sprite.width)},h={int(sprite.height)} ({texture_name})")
+    try:
+        for idx, sprite, img in sprite_set.iter_by_texture(visible):
+            if errors:
+                break
+            sprite_name = sprite.name or f"sprite_{sprite.texture_index}_{idx}"
+            tex_idx = sprite.texture_index
+            
+            out_path = f"{sprite_name}.png" if dir_fd is not None else os.path.join(output_dir, f"{sprite_name}.png")
+            q_enc.put((out_path, img))
+            exported+=1
+            texture_name = sprite_set.texture_set.textures[sprite.texture_index].name or f"texture_{tex_idx}"
+            log.debug("  Exported: %s (%s) x=%d,y=%d,w=%d,h=%d (%s)", sprite_name, img.size,
+                      sprite.x, sprite.y, sprite.width, sprite.height, texture_name)
+    finally:
+        q_enc.put(None)
+        for t in stages:
+            t.join()
+        if dir_fd is not None:
+            os.close(dir_fd)
+    if errors:
+        raise errors[0]
     
-    print(f"\nExported {exported} sprites to {output_dir}")
+    log.info("Exported %d sprites to %s", exported, output_dir)
+
 
+def _exportable_sprites(sprite_set: SpriteSet) -> list[int]:
+    # placeholder sprites (empty or off-texture rect) are not exported, and textures
+    # only they point at are never decoded
+    visible = sprite_set.visible_sprites()
+    if len(visible) < len(sprite_set.sprites):
+        log.info("Skipping %d sprites with an empty or off-texture rect", len(sprite_set.sprites) - len(visible))
+    return visible
 
-def export_textures_to_png(file_path: str, output_dir: str, flip: bool = False):
+
+def _export_sprites_parallel(sprite_set: SpriteSet, output_dir: str, compress_level: int, workers: int,
+                             indices: list[int]) -> int:
+    # decode/crop here, deflate + write in the worker processes; in-flight jobs are
+    # capped so cropped images do not pile up faster than the workers drain them
+    exported = 0
+    pending = set()
+    # never fork this process: numba's worker threads may already be running in it
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as ex:
+        for idx, sprite, img in sprite_set.iter_by_texture(indices):
+            if len(pending) >= workers * PIPELINE_DEPTH:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    fut.result()
+            sprite_name = sprite.name or f"sprite_{sprite.texture_index}_{idx}"
+            tex_idx = sprite.texture_index
+            
+            out_path = os.path.join(output_dir, f"{sprite_name}.png")
+            pending.add(ex.submit(_save_png_job, (out_path, img, compress_level)))
+            exported += 1
+            texture_name = sprite_set.texture_set.textures[tex_idx].name or f"texture_{tex_idx}"
+            log.debug("  Exported: %s (%s) x=%d,y=%d,w=%d,h=%d (%s)", sprite_name, img.size,
+                      sprite.x, sprite.y, sprite.width, sprite.height, texture_name)
+        for fut in pending:
+            fut.result()
+    return exported
+
+
+def export_sprites_to_tar(file_path: str, out_tar_path: str, compress_level: int = 1):
+    """Parse sprites from .bin or .farc file and pack every sprite PNG into one uncompressed tar.
+    compress_level is the PNG zlib level, as for export_sprites_to_png."""
+    out_dir = os.path.dirname(out_tar_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    sprite_set = SpriteSet_from_file(filepath=file_path)
+    
+    log.info("Found %d sprites and %d textures", len(sprite_set.sprites), len(sprite_set.texture_set.textures))
+    visible = _exportable_sprites(sprite_set)
+    
+    # One open() and large sequential writes for the whole set instead of one file per sprite
+    exported = 0
+    buf = io.BytesIO()
+    mtime = int(time.time())
+    with tarfile.open(out_tar_path, 'w|', bufsize=1 << 20) as tar:
+        for idx, sprite, img in sprite_set.iter_by_texture(visible):
+            sprite_name = sprite.name or f"sprite_{sprite.texture_index}_{idx}"
+            buf.seek(0)
+            buf.truncate()
+            img.save(buf, format='PNG', optimize=False, compress_level=compress_level)
+            info = tarfile.TarInfo(f"{sprite_name}.png")
+            info.size = buf.tell()
+            info.mtime = mtime
+            buf.seek(0)
+            tar.addfile(info, buf)
+            exported += 1
+            log.debug("  Packed: %s (%s)", sprite_name, img.size)
+    
+    log.info("Exported %d sprites to %s", exported, out_tar_path)
+
+
+def export_textures_to_png(file_path: str, output_dir: str, flip: bool = False, compress_level: int = 1):
     """
     Parse textures from .bin or .farc file and export each texture as PNG.
     Automatically detects file type by header.
@@ -978,11 +1673,13 @@ def export_textures_to_png(file_path: str, output_dir: str, flip: bool = False):
         file_path: Path to .bin or .farc/.FArC/.FArc file
         output_dir: Output directory for PNG files
         flip: Whether to flip texture vertically (default: False)
+        compress_level: PNG zlib level 0-9 (default: 1, favors export speed over file size)
     """
     os.makedirs(output_dir, exist_ok=True)
     
     texture_set = SpriteSet_from_file(filepath=file_path).texture_set
-    print(f"Found {len(texture_set.textures)} textures")
+    log.info("Found %d textures", len(texture_set.textures))
+    texture_set.decode_all_base_images()
     
     # Export each texture
     exported = []
@@ -990,7 +1687,7 @@ def export_textures_to_png(file_path: str, output_dir: str, flip: bool = False):
         try:
             img = tex.image
             if not img:
-                print(f"  Skipping texture {idx}: no base mip available")
+                log.warning("  Skipping texture %d: no base mip available", idx)
                 continue
             
             # Flip if requested
@@ -999,17 +1696,18 @@ def export_textures_to_png(file_path: str, output_dir: str, flip: bool = False):
             
             tex_name = tex.name or f"texture_{idx}"
             out_path = os.path.join(output_dir, f"{tex_name}.png")
-            img.save(out_path)
+            img.save(out_path, optimize=False, compress_level=compress_level)
             exported.append(out_path)
-            print(f"  Exported: {tex_name} ({img.size})")
+            log.debug("  Exported: %s (%s)", tex_name, img.size)
         except Exception as e:
-            print(f"  Failed to export texture {idx}: {e}")
+            log.warning("  Failed to export texture %d: %s", idx, e)
     
-    print(f"\nExported {len(exported)} textures to {output_dir}")
+    log.info("Exported %d textures to %s", len(exported), output_dir)
 
 
 def main():
     parser = argparse.ArgumentParser(description='TXP/TXD/Sprite summary and extract tool')
+    parser.add_argument('-v', '--verbose', action='store_true', help='also log per-entry archive parsing and per-sprite/texture export details')
     sub = parser.add_subparsers(dest='command')
 
     p_txd = sub.add_parser('txd', help='parse texture file and dump subtextures')
@@ -1025,17 +1723,26 @@ def main():
     p_export = sub.add_parser('export-sprites', help='extract and save all sprites as PNG files (auto-detects .bin or .farc)')
     p_export.add_argument('path', help='path to .bin or .farc/.FArC/.FArc file')
     p_export.add_argument('-o', '--output', help='output directory (default: ./sprites_export)')
+    p_export.add_argument('--final', action='store_true', help='use zlib level 9 for release exports (default: level 1)')
+    p_export.add_argument('--tar', action='store_true', help='pack all PNGs into a single uncompressed tar at OUTPUT (default: ./sprites_export.tar)')
+    p_export.add_argument('-j', '--jobs', type=int, default=1, help='encode PNGs in up to JOBS worker processes for large sprite sets (default: 1, threads only)')
     
     p_export_tex = sub.add_parser('export-textures', help='extract and save all textures as PNG files (auto-detects .bin or .farc)')
     p_export_tex.add_argument('path', help='path to .bin or .farc/.FArC/.FArc file')
     p_export_tex.add_argument('-o', '--output', help='output directory (default: ./textures_export)')
     p_export_tex.add_argument('--flip', action='store_true', help='flip texture vertically')
+    p_export_tex.add_argument('--final', action='store_true', help='use zlib level 9 for release exports (default: level 1)')
     
     p_farc = sub.add_parser('extract-farc', help='extract files from FARC archive')
     p_farc.add_argument('path', help='path to .farc file')
     p_farc.add_argument('-o', '--output', help='output directory (default: ./farc_extract)')
 
     args = parser.parse_args()
+    # log through stdout's own buffer: one write per block when piped instead of a flush per line
+    logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[BufferedStreamHandler(sys.stdout)])
+    if args.verbose:
+        # only this module's details; third-party loggers (numba's compiler dumps) stay at INFO
+        log.setLevel(logging.DEBUG)
     if not args.command:
         parser.print_help()
         return
@@ -1045,20 +1752,25 @@ def main():
     elif args.command == 'spr':
         parse_spr(args.path)
     elif args.command == 'export-sprites':
-        export_sprites_to_png(args.path, args.output or 'sprites_export')
+        if args.tar:
+            export_sprites_to_tar(args.path, args.output or 'sprites_export.tar', compress_level=9 if args.final else 1)
+        else:
+            export_sprites_to_png(args.path, args.output or 'sprites_export', compress_level=9 if args.final else 1,
+                                  processes=args.jobs)
     elif args.command == 'export-textures':
-        export_textures_to_png(args.path, args.output or 'textures_export', flip=args.flip)
+        export_textures_to_png(args.path, args.output or 'textures_export', flip=args.flip, compress_level=9 if args.final else 1)
     elif args.command == 'extract-farc':
         extract_farc(args.path, args.output or 'farc_extract')
     elif args.command == 'summary':
         blocks = collect_txp_blocks(args.path)
         out = {'file': args.path, 'txp_blocks': blocks, 'sprites': []}
         # if the file itself is a sprite set, parse sprites
-        # Attempt to parse SpriteSet using both endiannesses and from root
+        # Attempt to parse SpriteSet from root and each block offset (endianness probed per offset)
         try:
+            # parse in place from a read-only mapping rather than a full read() + BytesIO copy
             with open(args.path, 'rb') as f:
-                data = f.read()
-            ss = try_parse_sprites_from_bytes(data, candidate_offsets=[b['offset'] for b in blocks])
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            ss = try_parse_sprites_from_fileobj(mm, candidate_offsets=[b['offset'] for b in blocks])
             sprites = []
             if ss and ss.sprites:
                 for i, s in enumerate(ss.sprites):
@@ -1077,38 +1789,97 @@ def main():
 
         # optionally export base mips
         if getattr(args, 'export_base_mip', False):
-            blocks2, exported = export_base_mips(args.path, None)
+            blocks2, exported = export_base_mips(args.path, None, blocks=blocks)
             out['exported_base_mips'] = exported
 
         json_path = os.path.splitext(args.path)[0] + '.summary.json'
-        with open(json_path, 'w', encoding='utf-8') as jf:
-            json.dump(out, jf, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(json_path, 'wb') as jf:
+                jf.write(orjson.dumps(out, option=orjson.OPT_INDENT_2))
+        else:
+            with open(json_path, 'w', encoding='utf-8') as jf:
+                json.dump(out, jf, indent=2, ensure_ascii=False)
 
-        print('Wrote summary to', json_path)
+        log.info('Wrote summary to %s', json_path)
 
 
 
+def _detect_endian(f, off=0) -> 'bool | None':
+    """
+    探测 off 处 SpriteSet 的字节序：按哪种字节序读出的 textures_offset 恰好指向同字节序的
+    TextureSet 签名，就返回该字节序（True 为 little）；无法判断时返回 None。
+    """
+    cur = f.tell()
+    try:
+        f.seek(off)
+        hdr = f.read(8)
+        if len(hdr) < 8:
+            return None
+        for little in (True, False):
+            endian = '<' if little else '>'
+            tex_off, = struct.unpack_from(endian + 'I', hdr, 4)
+            if tex_off == 0:
+                continue
+            try:
+                f.seek(tex_off)
+            except (ValueError, OSError):
+                continue
+            if f.read(4) == struct.pack(endian + 'I', TXP_TEXSET_SIG):
+                return little
+        return None
+    finally:
+        f.seek(cur)
+
+
+def _endian_orders(f, off=0) -> tuple:
+    """
+    off 处需要尝试的字节序：探测确定时只试该字节序；以 TXP 签名开头的块（如 summary 传入的
+    candidate_offsets）不可能是 SpriteSet，返回空元组；无法判断（如 textures_offset 为 0）时两种都试。
+    """
+    cur = f.tell()
+    try:
+        f.seek(off)
+        if f.read(4) in _TXP_SIG_TABLE:
+            return ()
+    finally:
+        f.seek(cur)
+    little = _detect_endian(f, off)
+    return (True, False) if little is None else (little,)
+
+
 # 新增：统一尝试使用大小端解析 SpriteSet 的辅助函数
 def try_parse_sprites_from_bytes(data: bytes, candidate_offsets=None) -> 'SpriteSet | None':
     """
-    尝试从 bytes 中解析 SpriteSet。会尝试 little/big endian 两种模式。
+    尝试从 bytes 中解析 SpriteSet。字节序优先由 _detect_endian 按 TextureSet 签名确定，无法判断时 little/big endian 两种都试。
     如果提供 candidate_offsets，会按这些偏移（以及 0）尝试解析（用于文件中嵌入块的情况）。
     返回第一个成功解析且包含 sprites 的 SpriteSet，否则返回 None。
     """
+    # 子纹理数据直接切自 data 的 memoryview，不经 BytesIO.getbuffer() 再复制整块
+    return try_parse_sprites_from_fileobj(io.BytesIO(data), candidate_offsets, view=memoryview(data))
+
+
+def try_parse_sprites_from_fileobj(f, candidate_offsets=None, view=None) -> 'SpriteSet | None':
+    """
+    与 try_parse_sprites_from_bytes 相同，但直接在可 seek 的文件对象（文件、BytesIO、mmap）上解析。
+    mmap 不复制数据；其它来源可通过 view 传入底层数据的 memoryview 达到同样效果（见 Reader）。
+    """
     if candidate_offsets is None:
         candidate_offsets = [0]
     else:
         # 确保包含根偏移 0
         candidate_offsets = [0] + list(candidate_offsets)
 
+    # 偏移只排序去重一次；所有偏移共用一个 Reader，直到有偏移需要解析才创建
+    r = None
     for off in sorted(set(candidate_offsets)):
-        for little in (True, False):
+        # 探测确定字节序时只解析一次；探测不出时按两种字节序试解析
+        for little in _endian_orders(f, off):
+            if r is None:
+                r = Reader(f, view)
+            r.set_endian(little)
+            r.seek(off)
+            r.push_base(off)
             try:
-                fobj = io.BytesIO(data)
-                r = Reader(fobj)
-                r.set_endian(little)
-                r.seek(off)
-                r.push_base(off)
                 ss = SpriteSet()
                 ss.read(r)
                 if ss.sprites:
@@ -1116,10 +1887,7 @@ def try_parse_sprites_from_bytes(data: bytes, candidate_offsets=None) -> 'Sprite
             except Exception:
                 pass
             finally:
-                try:
-                    r.pop_base()
-                except Exception:
-                    pass
+                r.pop_base()
     return None
 
 if __name__ == '__main__':